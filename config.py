@@ -30,6 +30,13 @@ NUM_PIXELS = 12
 ENABLE_AUDIO = False
 AUDIO_DEVICE = "default"
 
+# Speech recognition
+WHISPER_DEFAULT = "base"  # model used until setup.sh benchmarks this Pi (--pick-whisper-model)
+WHISPER_MODELS = ["tiny", "base", "small"]  # smallest to largest
+WHISPER_LATENCY_BUDGET_S = 1.5  # seconds to transcribe a short spoken prompt
+VAD_AGGRESSIVENESS = 2  # webrtcvad speech filtering (0-3, higher = stricter)
+VAD_SILENCE_MS = 300  # end the prompt after this much silence
+
 # Connection settings
 CONNECTION_TIMEOUT = 180  # seconds
 MAX_RETRIES = 2
@@ -51,3 +58,7 @@ def get_mode_description():
         return f"Local Ollama (standalone mode)"
     else:
         return f"Network Server ({OLLAMA_SERVER})"
+
+# Resolved once at import - MODE only changes when the scripts rewrite this file
+OLLAMA_URL = get_ollama_url()
+MODE_DESCRIPTION = get_mode_description()
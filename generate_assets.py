@@ -5,7 +5,13 @@ Creates all necessary images programmatically
 """
 
 import os
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+import sys
+import math
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageFilter
 
 # Screen dimensions (rotated for portrait book mode)
 SCREEN_WIDTH = 864
@@ -13,6 +19,13 @@ SCREEN_HEIGHT = 1152
 
 # Output directory
 ASSETS_DIR = "images"
+MANIFEST_PATH = os.path.join(ASSETS_DIR, ".manifest.json")
+
+# Fast zlib setting - the files are a bit larger but encode several times faster
+PNG_COMPRESS_LEVEL = 1
+
+# Pass --force to regenerate assets even if they are up to date
+FORCE = '--force' in sys.argv[1:]
 
 # Colors
 PAPER_COLOR = (255, 250, 240)  # Warm off-white
@@ -24,14 +37,68 @@ BUTTON_TEXT = (255, 255, 255)
 LOADING_BG = (50, 50, 70)  # Dark blue-gray
 LOADING_TEXT = (200, 200, 220)
 
+# Loading spinner: 8 dots, 45 degrees apart, on a 60px radius
+SPINNER_OFFSETS = tuple(
+    (int(60 * math.cos(math.radians(i * 45))), int(60 * math.sin(math.radians(i * 45))))
+    for i in range(8)
+)
+
 def create_directory():
     """Create images directory if it doesn't exist"""
     if not os.path.exists(ASSETS_DIR):
         os.makedirs(ASSETS_DIR)
     print(f"✅ Created {ASSETS_DIR}/ directory")
 
+def _load_manifest():
+    """Load the filename -> input hash manifest of generated assets"""
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_manifest(manifest):
+    """Write the manifest atomically (temp file + rename)"""
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def asset_key(*inputs):
+    """Hash everything an asset depends on, including this script's source"""
+    with open(os.path.abspath(__file__), "rb") as f:
+        source = f.read()
+    digest = hashlib.sha256(source)
+    digest.update(repr((SCREEN_WIDTH, SCREEN_HEIGHT) + inputs).encode())
+    return digest.hexdigest()
+
+def is_up_to_date(filename, key):
+    """Check if an asset exists and was generated from the same inputs"""
+    if FORCE or not os.path.exists(f"{ASSETS_DIR}/{filename}"):
+        return False
+    if _load_manifest().get(filename) != key:
+        return False
+    print(f"⏭️  {filename} is up to date")
+    return True
+
+def save_asset(img, filename, key):
+    """Save an asset and return its (filename, key) manifest entry"""
+    img.save(f"{ASSETS_DIR}/{filename}", compress_level=PNG_COMPRESS_LEVEL, optimize=False)
+    print(f"✅ Created {filename}")
+    return filename, key
+
+def record_assets(entries):
+    """Record the input hashes of newly created assets in the manifest"""
+    manifest = _load_manifest()
+    manifest.update(entries)
+    _save_manifest(manifest)
+
 def create_welcome_image():
     """Create welcome screen"""
+    key = asset_key("welcome.png", BACKGROUND_COLOR)
+    if is_up_to_date("welcome.png", key):
+        return
+    
     img = Image.new('RGB', (SCREEN_WIDTH, SCREEN_HEIGHT), BACKGROUND_COLOR)
     draw = ImageDraw.Draw(img)
     
@@ -75,42 +142,54 @@ def create_welcome_image():
     draw.line([book_x + book_width // 2, book_y, book_x + book_width // 2, book_y + book_height], 
               fill=(150, 130, 110), width=3)
     
-    img.save(f"{ASSETS_DIR}/welcome.png")
-    print("✅ Created welcome.png")
+    return save_asset(img, "welcome.png", key)
+
+def _edge_ramp(length):
+    """Vignette alpha along one axis (255 beyond the 200px border)"""
+    edge = np.arange(length, dtype=np.int16)
+    edge = np.minimum(edge, length - edge)
+    # Integer form of int(edge * 0.3), without a float temporary
+    return np.where(edge < 200, edge * 3 // 10, 255).astype(np.uint8)
 
 def create_paper_background():
     """Create paper texture background"""
-    img = Image.new('RGB', (SCREEN_WIDTH, SCREEN_HEIGHT), PAPER_COLOR)
-    draw = ImageDraw.Draw(img)
+    key = asset_key("paper_background.png", PAPER_COLOR, PAPER_TEXTURE_COLOR)
+    if is_up_to_date("paper_background.png", key):
+        return
     
-    # Add subtle texture with random dots
-    import random
-    for _ in range(5000):
-        x = random.randint(0, SCREEN_WIDTH)
-        y = random.randint(0, SCREEN_HEIGHT)
-        color_variation = random.randint(-10, 10)
-        color = tuple(max(0, min(255, c + color_variation)) for c in PAPER_TEXTURE_COLOR)
-        draw.point((x, y), fill=color)
+    pixels = np.full((SCREEN_HEIGHT, SCREEN_WIDTH, 3), PAPER_COLOR, dtype=np.uint8)
+    
+    # Add subtle texture with random dots (all 5000 written in one go)
+    rng = np.random.default_rng()
+    xs = rng.integers(0, SCREEN_WIDTH, 5000)
+    ys = rng.integers(0, SCREEN_HEIGHT, 5000)
+    color_variation = rng.integers(-10, 11, 5000, dtype=np.int16)
+    colors = np.array(PAPER_TEXTURE_COLOR, dtype=np.int16) + color_variation[:, None]
+    pixels[ys, xs] = np.clip(colors, 0, 255).astype(np.uint8)
+    img = Image.fromarray(pixels)
     
     # Apply slight blur for texture
     img = img.filter(ImageFilter.GaussianBlur(radius=0.5))
     
     # Add subtle vignette
-    overlay = Image.new('RGBA', (SCREEN_WIDTH, SCREEN_HEIGHT), (0, 0, 0, 0))
-    overlay_draw = ImageDraw.Draw(overlay)
-    
-    for i in range(200):
-        alpha = int(i * 0.3)
-        overlay_draw.rectangle([i, i, SCREEN_WIDTH - i, SCREEN_HEIGHT - i], 
-                              outline=(0, 0, 0, alpha))
+    # Each pixel takes the alpha of the innermost 1px ring it sits on, i.e.
+    # its distance to the nearest edge. The ramp rises with distance, so the
+    # smaller of the row and column ramps is the nearer edge's alpha
+    alpha = np.minimum(_edge_ramp(SCREEN_HEIGHT)[:, None], _edge_ramp(SCREEN_WIDTH)[None, :])
+    alpha[200:SCREEN_HEIGHT - 199, 200:SCREEN_WIDTH - 199] = 0  # No vignette in the middle
     
-    img = Image.alpha_composite(img.convert('RGBA'), overlay).convert('RGB')
+    # The overlay is black, so blending just scales each pixel by (255 - alpha) / 255
+    keep = Image.fromarray(255 - alpha, 'L').convert('RGB')
+    img = ImageChops.multiply(img, keep)
     
-    img.save(f"{ASSETS_DIR}/paper_background.png")
-    print("✅ Created paper_background.png")
+    return save_asset(img, "paper_background.png", key)
 
 def create_loading_image():
     """Create loading screen"""
+    key = asset_key("loading.png", LOADING_BG, LOADING_TEXT)
+    if is_up_to_date("loading.png", key):
+        return
+    
     img = Image.new('RGB', (SCREEN_WIDTH, SCREEN_HEIGHT), LOADING_BG)
     draw = ImageDraw.Draw(img)
     
@@ -131,54 +210,69 @@ def create_loading_image():
     center_x = SCREEN_WIDTH // 2
     center_y = SCREEN_HEIGHT // 2 + 80
     
-    for i in range(8):
-        angle = i * 45
-        import math
-        x = center_x + int(60 * math.cos(math.radians(angle)))
-        y = center_y + int(60 * math.sin(math.radians(angle)))
+    for i, (dx, dy) in enumerate(SPINNER_OFFSETS):
+        x = center_x + dx
+        y = center_y + dy
         alpha = 255 - (i * 30)
         draw.ellipse([x - 15, y - 15, x + 15, y + 15], 
                      fill=(200, 200, 220, alpha))
     
-    img.save(f"{ASSETS_DIR}/loading.png")
-    print("✅ Created loading.png")
+    return save_asset(img, "loading.png", key)
 
-def create_button(text, filename):
-    """Create a rounded button with text"""
-    button_width = 180
-    button_height = 72
-    
+# Button template, shared by every button variant
+BUTTON_WIDTH = 180
+BUTTON_HEIGHT = 72
+BUTTON_RADIUS = 15
+
+try:
+    BUTTON_FONT = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 36)
+except:
+    BUTTON_FONT = ImageFont.load_default()
+
+def _make_base_button():
+    """Create the rounded button background without any text"""
     # Create button with alpha channel for rounded corners
-    img = Image.new('RGBA', (button_width, button_height), (0, 0, 0, 0))
+    img = Image.new('RGBA', (BUTTON_WIDTH, BUTTON_HEIGHT), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
     
     # Draw rounded rectangle
-    radius = 15
-    draw.rounded_rectangle([0, 0, button_width, button_height], 
-                          radius=radius, fill=BUTTON_COLOR)
+    draw.rounded_rectangle([0, 0, BUTTON_WIDTH, BUTTON_HEIGHT], 
+                          radius=BUTTON_RADIUS, fill=BUTTON_COLOR)
     
     # Add subtle shadow/3D effect
-    draw.rounded_rectangle([2, 2, button_width - 2, button_height - 2], 
-                          radius=radius, outline=(255, 255, 255, 100), width=2)
+    draw.rounded_rectangle([2, 2, BUTTON_WIDTH - 2, BUTTON_HEIGHT - 2], 
+                          radius=BUTTON_RADIUS, outline=(255, 255, 255, 100), width=2)
+    return img
+
+BASE_BUTTON = _make_base_button()
+
+def create_button(text, filename):
+    """Create a rounded button with text"""
+    key = asset_key(filename, text, BUTTON_COLOR, BUTTON_TEXT)
+    if is_up_to_date(filename, key):
+        return
     
-    try:
-        font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 36)
-    except:
-        font = ImageFont.load_default()
+    img = BASE_BUTTON.copy()
+    draw = ImageDraw.Draw(img)
     
     # Center text
-    bbox = draw.textbbox((0, 0), text, font=font)
+    bbox = draw.textbbox((0, 0), text, font=BUTTON_FONT)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
-    text_x = (button_width - text_width) // 2
-    text_y = (button_height - text_height) // 2 - 5
+    text_x = (BUTTON_WIDTH - text_width) // 2
+    text_y = (BUTTON_HEIGHT - text_height) // 2 - 5
     
     # Text with shadow
-    draw.text((text_x + 2, text_y + 2), text, fill=(0, 0, 0, 100), font=font)
-    draw.text((text_x, text_y), text, fill=BUTTON_TEXT, font=font)
+    draw.text((text_x + 2, text_y + 2), text, fill=(0, 0, 0, 100), font=BUTTON_FONT)
+    draw.text((text_x, text_y), text, fill=BUTTON_TEXT, font=BUTTON_FONT)
     
-    img.save(f"{ASSETS_DIR}/{filename}")
-    print(f"✅ Created {filename}")
+    return save_asset(img, filename, key)
+
+BUTTONS = [
+    ("◀ Back", "button_back.png"),
+    ("Next ▶", "button_next.png"),
+    ("✨ New", "button_new.png"),
+]
 
 def main():
     print("========================================")
@@ -186,12 +280,20 @@ def main():
     print("========================================\n")
     
     create_directory()
-    create_welcome_image()
-    create_paper_background()
-    create_loading_image()
-    create_button("◀ Back", "button_back.png")
-    create_button("Next ▶", "button_next.png")
-    create_button("✨ New", "button_new.png")
+    
+    # The assets are independent, so render them on all cores at once
+    with ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(create_welcome_image),
+            executor.submit(create_paper_background),
+            executor.submit(create_loading_image),
+        ]
+        for text, filename in BUTTONS:
+            futures.append(executor.submit(create_button, text, filename))
+        created = [future.result() for future in futures]
+    
+    # Skipped assets return None
+    record_assets(entry for entry in created if entry)
     
     print("\n========================================")
     print("✅ All assets created successfully!")
@@ -17,6 +17,9 @@ MODEL_LOCAL="gemma2:2b"     # Faster model for local RPi
 MODEL_SERVER="llama3.1:70b" # Better model for school server
 MODEL="${MODEL_LOCAL}"       # Default to local model
 
+# Asset generation: set to "yes" to use Pillow-SIMD (x86_64 hosts only)
+USE_PILLOW_SIMD="no"
+
 
 REPO_USER="mikestringer"  # github username e.g. https://github.com/mikestringer
 REPO_NAME="storybook-setup"
@@ -36,7 +39,7 @@ sudo apt update && sudo apt upgrade -y
 # Install dependencies
 echo "📦 [2/5] Installing dependencies..."
 #sudo apt install -y python3-pip python3-venv git
-sudo apt install -y python3-pip python3-venv git portaudio19-dev flac
+sudo apt install -y python3-pip python3-venv git portaudio19-dev flac libjpeg-dev zlib1g-dev python3-numpy python3-pil espeak-ng
 
 # Install Ollama locally if in local mode
 if [ "$INSTALL_MODE" = "local" ]; then
@@ -83,6 +86,17 @@ chmod +x storybook_console.py
 chmod +x storybook_ui.py
 chmod +x switch_mode.sh
 
+# Optional: Pillow-SIMD is a faster drop-in for Pillow, but only on x86 (SSE4/AVX2).
+# It goes into the user site of the system python3, which runs generate_assets.py
+# below, and takes precedence over apt's python3-pil. Its releases are 9.x, so it
+# can't be used in the venv, where requirements.txt pins Pillow>=10.0.0.
+if [ "$USE_PILLOW_SIMD" = "yes" ] && [ "$(uname -m)" = "x86_64" ]; then
+    echo "🎨 Installing Pillow-SIMD for asset generation..."
+    sudo apt install -y python3-dev
+    python3 -m pip install --user --break-system-packages "pillow-simd<10" || \
+        echo "⚠️  Pillow-SIMD install failed - using stock Pillow"
+fi
+
 # Generate image assets for UI
 echo "🎨 Generating UI assets..."
 python3 generate_assets.py
@@ -101,6 +115,13 @@ source venv/bin/activate
 pip install --upgrade pip
 pip install -r requirements.txt
 
+# Pick the largest Whisper model that is fast enough on this Pi, timed on a
+# spoken test prompt. The choice is cached in .whisper_model for startup.
+echo "🎤 Choosing speech recognition model..."
+espeak-ng -w /tmp/storybook_prompt.wav "a brave little robot bird who wants to fly to the moon" && \
+    python3 storybook_console.py --pick-whisper-model /tmp/storybook_prompt.wav || \
+    echo "⚠️  Benchmark failed - using the default speech model"
+
 chmod +x storybook.py
 
 # Test the installation
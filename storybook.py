@@ -6,25 +6,12 @@ Auto-detects display and launches appropriate version
 
 import os
 import sys
-import subprocess
 
 def has_display():
     """Check if a display is available"""
-    # Check DISPLAY environment variable
-    if 'DISPLAY' in os.environ:
-        return True
-    
-    # Check if running on console
-    try:
-        result = subprocess.run(
-            ['xset', 'q'],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=1
-        )
-        return result.returncode == 0
-    except:
-        return False
+    # Check DISPLAY / WAYLAND_DISPLAY environment variables. SSH and systemd
+    # sessions have neither, so they get the console version
+    return 'DISPLAY' in os.environ or 'WAYLAND_DISPLAY' in os.environ
 
 def main():
     """Launch appropriate version"""
@@ -4,12 +4,74 @@ Magic Storybook - Main Application
 Supports both local and server modes with voice input
 """
 
+import os
 import sys
+import socket
 import time
+import threading
+import collections
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+import numpy as np
 import speech_recognition as sr
+import webrtcvad
+from faster_whisper import WhisperModel
 from config import *
 
+class OllamaAdapter(HTTPAdapter):
+    """
+    Connection pool for Ollama that also enables TCP keep-alive probes,
+    so a dead connection is eventually detected instead of hanging
+    """
+    def init_poolmanager(self, *args, **kwargs):
+        # urllib3's defaults already set TCP_NODELAY - keep them and add keep-alive
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+# Reuse one keep-alive connection to Ollama instead of reconnecting per request
+SESSION = requests.Session()
+SESSION.headers['Connection'] = 'keep-alive'
+SESSION.mount(OLLAMA_URL, OllamaAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+
+# Ollama API endpoints
+GENERATE_URL = f"{OLLAMA_URL}/api/generate"
+TAGS_URL = f"{OLLAMA_URL}/api/tags"
+
+# webrtcvad accepts 16-bit mono audio in 10/20/30 ms frames
+VAD_SAMPLE_RATE = 16000
+VAD_FRAME_MS = 30
+
+# Whisper model picked for this machine by --pick-whisper-model
+WHISPER_CHOICE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".whisper_model")
+
+# Searching re-initializes PortAudio, so only do it once per process
+_usb_mic_index = None
+_usb_mic_searched = False
+
+def find_usb_mic():
+    """
+    Find the USB microphone's device index (None if there isn't one)
+    Set STORYBOOK_MIC_INDEX to skip the search on a known setup
+    """
+    global _usb_mic_index, _usb_mic_searched
+    
+    if not _usb_mic_searched:
+        if 'STORYBOOK_MIC_INDEX' in os.environ:
+            _usb_mic_index = int(os.environ['STORYBOOK_MIC_INDEX'])
+        else:
+            for i, name in enumerate(sr.Microphone.list_microphone_names()):
+                if 'USB' in name.upper() or 'PNP' in name.upper():
+                    _usb_mic_index = i
+                    print(f"🎤 Found USB microphone: {name}")
+                    break
+        _usb_mic_searched = True
+    
+    return _usb_mic_index
+
 class VoiceListener:
     """
     Voice listener using local Whisper (no API key needed)
@@ -18,31 +80,37 @@ class VoiceListener:
         print("🎤 Initializing voice listener...")
         
         # Find USB microphone automatically
-        mic_list = sr.Microphone.list_microphone_names()
-        usb_mic_index = None
-        for i, name in enumerate(mic_list):
-            if 'USB' in name.upper() or 'PNP' in name.upper():
-                usb_mic_index = i
-                print(f"🎤 Found USB microphone: {name}")
-                break
+        usb_mic_index = find_usb_mic()
         
-        if usb_mic_index is not None:
-            self.microphone = sr.Microphone(device_index=usb_mic_index)
-        else:
-            self.microphone = sr.Microphone()
+        # Open the mic at its own default rate - many USB mics only offer
+        # 44.1/48 kHz, so audio is resampled to 16 kHz for the VAD instead
+        self.microphone = sr.Microphone(device_index=usb_mic_index)
+        self.vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
         
+        # Only used for its calibrated energy threshold - phrases are
+        # endpointed by record_phrase()
         self.recognizer = sr.Recognizer()
         self.recognizer.energy_threshold = energy_threshold
-        self.recognizer.dynamic_energy_threshold = False
-        self.recognizer.pause_threshold = 1
         self.record_timeout = record_timeout
         
+        # Load Whisper once up front instead of on every recognition
+        self.model_name = load_whisper_choice()
+        print(f"🎤 Loading speech model ({self.model_name})...")
+        # int8 weights run several times faster than FP32 on the RPi CPU
+        self.whisper_model = WhisperModel(self.model_name, device="cpu", compute_type="int8")
+        
         # Calibrate for ambient noise
         print("🎤 Calibrating microphone...")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=2)
+        self.calibrate()
         print("✅ Microphone ready!")
     
+    def calibrate(self, duration=2):
+        """
+        Adjust the energy threshold for the current ambient noise
+        """
+        with self.microphone as source:
+            self.recognizer.adjust_for_ambient_noise(source, duration=duration)
+    
     def listen_for_prompt(self):
         """
         Listen for a story prompt from the user
@@ -53,7 +121,7 @@ class VoiceListener:
         with self.microphone as source:
             try:
                 # Listen for audio
-                audio = self.recognizer.listen(
+                audio = self.record_phrase(
                     source, 
                     timeout=5,
                     phrase_time_limit=self.record_timeout
@@ -63,11 +131,7 @@ class VoiceListener:
                 
                 # Use local Whisper to recognize
                 # This runs on the RPi - no API needed!
-                text = self.recognizer.recognize_whisper(
-                    audio,
-                    language="english",
-                    model="base"  # Options: tiny, base, small, medium, large
-                )
+                text = self.transcribe(audio)
                 
                 print(f"✅ You said: {text}")
                 return text.strip()
@@ -82,27 +146,201 @@ class VoiceListener:
                 print(f"❌ Error: {e}")
                 return None
 
+    def _vad_frames(self, source):
+        """
+        Yield 30 ms frames of 16 kHz audio from the microphone, resampled
+        (by linear interpolation) from the device's own sample rate
+        """
+        frame_samples = VAD_SAMPLE_RATE * VAD_FRAME_MS // 1000
+        step = source.SAMPLE_RATE / VAD_SAMPLE_RATE  # device samples per 16 kHz sample
+        offsets = step * np.arange(frame_samples)
+        
+        # sr.Microphone always records 16-bit mono
+        buffer = np.zeros(0, dtype=np.float32)
+        position = 0.0  # where the next output sample falls in buffer
+        while True:
+            chunk = np.frombuffer(source.stream.read(source.CHUNK), dtype=np.int16)
+            buffer = np.concatenate([buffer, chunk.astype(np.float32)])
+            
+            while position + offsets[-1] <= len(buffer) - 1:
+                frame = np.interp(position + offsets, np.arange(len(buffer)), buffer)
+                yield np.rint(frame).astype(np.int16).tobytes()
+                position += step * frame_samples
+            
+            # Drop device samples that every remaining output sample is past
+            used = int(position)
+            buffer = buffer[used:]
+            position -= used
+    
+    def record_phrase(self, source, timeout, phrase_time_limit):
+        """
+        Record one spoken phrase, starting when webrtcvad hears speech above
+        the calibrated energy threshold and ending after VAD_SILENCE_MS of silence
+        """
+        silence_frames_needed = VAD_SILENCE_MS // VAD_FRAME_MS
+        mic_frames = self._vad_frames(source)
+        
+        # Keep a little audio from before speech starts so the first word isn't clipped
+        frames = collections.deque(maxlen=silence_frames_needed)
+        waited_ms = 0
+        while True:
+            frame = next(mic_frames)
+            frames.append(frame)
+            # Noise the VAD mistakes for speech is usually quieter than the
+            # calibrated threshold, so require both to start a phrase
+            rms = np.sqrt(np.mean(np.frombuffer(frame, dtype=np.int16).astype(np.float32) ** 2))
+            loud_enough = rms > self.recognizer.energy_threshold
+            if loud_enough and self.vad.is_speech(frame, VAD_SAMPLE_RATE):
+                break
+            waited_ms += VAD_FRAME_MS
+            if waited_ms > timeout * 1000:
+                raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+        
+        frames = list(frames)
+        silent_frames = 0
+        phrase_ms = 0
+        while phrase_ms < phrase_time_limit * 1000:
+            frame = next(mic_frames)
+            frames.append(frame)
+            phrase_ms += VAD_FRAME_MS
+            
+            if self.vad.is_speech(frame, VAD_SAMPLE_RATE):
+                silent_frames = 0
+            else:
+                silent_frames += 1
+                if silent_frames >= silence_frames_needed:
+                    break
+        
+        return sr.AudioData(b"".join(frames), VAD_SAMPLE_RATE, source.SAMPLE_WIDTH)
+    
+    def transcribe(self, audio):
+        """
+        Transcribe recorded audio with the preloaded Whisper model
+        """
+        segments, _ = self.whisper_model.transcribe(audio_to_samples(audio), language="en")
+        return " ".join(segment.text.strip() for segment in segments)
+
+def audio_to_samples(audio):
+    """
+    Convert recorded AudioData to the 16 kHz mono float32 samples
+    in [-1, 1] that Whisper expects
+    """
+    raw = audio.get_raw_data(convert_rate=16000, convert_width=2)
+    return np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+def load_whisper_choice():
+    """
+    Return the Whisper model picked by --pick-whisper-model,
+    or WHISPER_DEFAULT if no benchmark has been run yet
+    """
+    try:
+        with open(WHISPER_CHOICE_PATH) as f:
+            name = f.read().strip()
+    except OSError:
+        return WHISPER_DEFAULT
+    return name if name in WHISPER_MODELS else WHISPER_DEFAULT
+
+def pick_whisper_model(clip_path):
+    """
+    Time each model in WHISPER_MODELS on a recorded speech clip and cache
+    the largest one that stays within WHISPER_LATENCY_BUDGET_S
+    Run once per machine (setup.sh does this) - startup just reads the cache
+    """
+    with sr.AudioFile(clip_path) as source:
+        samples = audio_to_samples(sr.Recognizer().record(source))
+    
+    # Always fall back to the smallest model, even if it is over budget
+    chosen = WHISPER_MODELS[0]
+    for name in WHISPER_MODELS:
+        model = WhisperModel(name, device="cpu", compute_type="int8")
+        
+        # Time the second run, the first one includes one-off setup costs
+        for _ in range(2):
+            start_time = time.time()
+            segments, _ = model.transcribe(samples, language="en")
+            text = " ".join(segment.text.strip() for segment in segments)
+            elapsed = time.time() - start_time
+        print(f"🎤 {name}: {elapsed:.1f} seconds - \"{text}\"")
+        
+        if elapsed > WHISPER_LATENCY_BUDGET_S:
+            break
+        chosen = name
+    
+    with open(WHISPER_CHOICE_PATH, "w") as f:
+        f.write(chosen + "\n")
+    print(f"✅ Using Whisper model: {chosen}")
+    return chosen
+
 def check_connection():
     """
     Check if we can connect to Ollama (local or server)
     """
-    ollama_url = get_ollama_url()
-    
     try:
-        response = requests.get(f"{ollama_url}/api/tags", timeout=5)
+        response = SESSION.get(TAGS_URL, timeout=5)
         return response.status_code == 200
     except:
         return False
 
-def generate_story(prompt):
+def warm_model():
     """
-    Generate a story using Ollama (local or server based on config)
+    Ask Ollama to load the model now so the first story doesn't pay for it
+    """
+    try:
+        SESSION.post(
+            GENERATE_URL,
+            json={
+                "model": MODEL,
+                "prompt": "",  # An empty prompt only loads the model
+                "stream": False,
+                "keep_alive": KEEP_ALIVE
+            },
+            timeout=CONNECTION_TIMEOUT
+        ).raise_for_status()
+    except Exception as e:
+        print(f"⚠️  Could not preload model: {e}")
+
+def stream_story(response, parts, echo=False, cancel=None):
+    """
+    Collect a streamed Ollama response into parts, optionally printing
+    tokens as they arrive (parts keeps what arrived if the stream fails)
+    Stops early and closes the response once cancel is set
     """
-    ollama_url = get_ollama_url()
+    # Read to the end of the body (Ollama ends it right after the 'done'
+    # chunk) rather than stopping at 'done', so the connection goes back
+    # to the pool and the next story reuses it
+    for line in response.iter_lines():
+        if cancel is not None and cancel.is_set():
+            response.close()
+            break
+        if not line:
+            continue
+        chunk = orjson.loads(line)
+        if 'error' in chunk:
+            raise RuntimeError(chunk['error'])
+        
+        token = chunk.get('response', '')
+        if echo:
+            if not parts:
+                print("\n📖 YOUR STORY:")
+                print("="*60)
+            sys.stdout.write(token)
+            sys.stdout.flush()
+        parts.append(token)
     
-    print(f"🤖 Mode: {get_mode_description()}")
+    return ''.join(parts).strip()
+
+def generate_story(prompt, echo=False, cancel=None):
+    """
+    Generate a story using Ollama (local or server based on config)
+    If echo is True, the story is printed while it is being generated
+    Setting the cancel event stops a story that is still streaming
+    """
+    print(f"🤖 Mode: {MODE_DESCRIPTION}")
     print(f"🤖 Generating story about: {prompt}")
     
+    # Set when part of the story was printed before the stream failed
+    interrupted = False
+    
     try:
         full_prompt = (
             f"Tell a short, imaginative story for children about {prompt}. "
@@ -111,13 +349,14 @@ def generate_story(prompt):
         )
         
         for attempt in range(MAX_RETRIES):
+            interrupted = False
             try:
-                response = requests.post(
-                    f"{ollama_url}/api/generate",
+                response = SESSION.post(
+                    GENERATE_URL,
                     json={
                         "model": MODEL,
                         "prompt": full_prompt,
-                        "stream": False,
+                        "stream": True,  # Show the story as it is written
                         "keep_alive": -1,  #The -1 means keep it loaded forever.
                         "options": {
                             "temperature": TEMPERATURE,
@@ -126,38 +365,74 @@ def generate_story(prompt):
                             "num_ctx": NUM_CTX
                         }
                     },
+                    stream=True,
                     timeout=CONNECTION_TIMEOUT
                 )
                 
                 response.raise_for_status()
-                story = response.json()['response']
-                print("✅ Story generated!")
-                return story.strip()
                 
             except requests.exceptions.Timeout:
                 if attempt < MAX_RETRIES - 1:
                     print(f"⏳ Timeout, retrying ({attempt + 1}/{MAX_RETRIES})...")
                     time.sleep(2)
+                    continue
                 else:
                     raise
             except requests.exceptions.ConnectionError:
                 if MODE == "server":
-                    return (
+                    story = (
                         "The magic book can't reach the story server right now. "
                         "Are we connected to the school network?"
                     )
                 else:
-                    return (
+                    story = (
                         "The magic book's storyteller is sleeping. "
                         "Please wake it up and try again!"
                     )
+                break
+            
+            parts = []
+            try:
+                story = stream_story(response, parts, echo=echo, cancel=cancel)
+            except Exception as e:
+                interrupted = echo and bool(parts)
+                if interrupted:
+                    print("\n" + "="*60)
+                    print("⚠️  Story interrupted")
+                
+                # A read timeout mid-stream arrives as a ConnectionError,
+                # so retry it rather than report the server as unreachable
+                retryable = isinstance(e, requests.exceptions.RequestException)
+                if retryable and attempt < MAX_RETRIES - 1:
+                    print(f"⏳ Story stream failed, retrying ({attempt + 1}/{MAX_RETRIES})...")
+                    time.sleep(2)
+                    continue
+                else:
+                    raise
+            
+            if cancel is not None and cancel.is_set():
+                return story
+            
+            if echo and parts:
+                print("\n" + "="*60 + "\n")
+            print("✅ Story generated!")
+            return story
     
     except Exception as e:
         print(f"❌ Error: {e}")
         if MODE == "server":
-            return "The story server seems to be having trouble. Try again in a moment!"
+            story = "The story server seems to be having trouble. Try again in a moment!"
         else:
-            return "The magic had a little hiccup. Try again!"
+            story = "The magic had a little hiccup. Try again!"
+    
+    # Show the fallback message like a story, unless part of a story
+    # was already printed above it
+    if echo and not interrupted:
+        print("\n📖 YOUR STORY:")
+        print("="*60)
+        print(story)
+        print("="*60 + "\n")
+    return story
 
 def test_installation():
     """
@@ -167,17 +442,15 @@ def test_installation():
     print("TESTING MAGIC STORYBOOK")
     print("="*60 + "\n")
     
-    print(f"Current mode: {get_mode_description()}\n")
+    print(f"Current mode: {MODE_DESCRIPTION}\n")
     
     # Test 1: Check connection
     print("Test 1: Checking Ollama connection...")
-    ollama_url = get_ollama_url()
-    
     try:
-        response = requests.get(f"{ollama_url}/api/tags", timeout=5)
+        response = SESSION.get(TAGS_URL, timeout=5)
         if response.status_code == 200:
-            print(f"✅ Connected to Ollama at {ollama_url}")
-            models = response.json().get('models', [])
+            print(f"✅ Connected to Ollama at {OLLAMA_URL}")
+            models = orjson.loads(response.content).get('models', [])
             print(f"   Available models: {[m['name'] for m in models]}")
             
             # Check if our model is available
@@ -247,8 +520,13 @@ def main():
         test_installation()
         return
     
+    # Benchmark Whisper models on a speech clip (run by setup.sh)
+    if len(sys.argv) > 2 and sys.argv[1] == '--pick-whisper-model':
+        pick_whisper_model(sys.argv[2])
+        return
+    
     print("🎪 Magic Storybook Starting...")
-    print(f"📚 Mode: {get_mode_description()}")
+    print(f"📚 Mode: {MODE_DESCRIPTION}")
     print(f"📚 Model: {MODEL}")
     
     # Check connection at startup
@@ -264,6 +542,9 @@ def main():
     
     print("✅ Ollama connection OK")
     
+    # Load the model in the background while the microphone is set up
+    threading.Thread(target=warm_model, daemon=True).start()
+    
     # Initialize voice listener
     try:
         listener = VoiceListener()
@@ -278,19 +559,30 @@ def main():
     print("\nSpeak your story idea when prompted...")
     print("Press Ctrl+C to exit\n")
     
+    # Set on Ctrl+C so a story that is still streaming stops printing
+    cancel = threading.Event()
+    
     try:
         while True:
             # Listen for voice input
             prompt = listener.listen_for_prompt()
             
             if prompt:
-                # Generate and display story
+                # Generate and display story on a daemon thread, so Ctrl+C
+                # exits right away instead of waiting for Ollama
                 print("\n" + "="*60)
-                story = generate_story(prompt)
-                print("\n📖 YOUR STORY:")
-                print("="*60)
-                print(story)
-                print("="*60 + "\n")
+                story_thread = threading.Thread(
+                    target=generate_story,
+                    args=(prompt,),
+                    kwargs={"echo": True, "cancel": cancel},
+                    daemon=True
+                )
+                story_thread.start()
+                
+                # Meanwhile, refresh the energy threshold that starts the
+                # next phrase, so the next prompt doesn't wait for it
+                listener.calibrate()
+                story_thread.join()
             else:
                 print("⚠️  No prompt detected. Try again!\n")
             
@@ -298,6 +590,7 @@ def main():
             time.sleep(2)
             
     except KeyboardInterrupt:
+        cancel.set()
         print("\n\n👋 Storybook shutting down...")
 
 if __name__ == "__main__":
@@ -5,12 +5,17 @@ Supports both local and server modes with voice input
 """
 
 import sys
+import socket
 import os
 import time
 import signal
+import threading
 import re
 import pygame
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
 import speech_recognition as sr
 from config import *
 
@@ -72,6 +77,64 @@ PARAGRAPH_SPACING = 20
 EXTRA_LINE_SPACING = 4
 
 
+class OllamaAdapter(HTTPAdapter):
+    """Ollama connection pool with TCP keep-alive probes enabled"""
+    def init_poolmanager(self, *args, **kwargs):
+        # urllib3's defaults already set TCP_NODELAY - keep them and add keep-alive
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+# Reuse one keep-alive connection to Ollama instead of reconnecting per request
+SESSION = requests.Session()
+SESSION.headers['Connection'] = 'keep-alive'
+SESSION.mount(OLLAMA_URL, OllamaAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+
+# Ollama API endpoint
+GENERATE_URL = f"{OLLAMA_URL}/api/generate"
+
+
+def warm_model():
+    """Ask Ollama to load the model now so the first story doesn't pay for it"""
+    try:
+        SESSION.post(
+            GENERATE_URL,
+            json={
+                "model": MODEL,
+                "prompt": "",  # An empty prompt only loads the model
+                "stream": False,
+                "keep_alive": KEEP_ALIVE
+            },
+            timeout=CONNECTION_TIMEOUT
+        ).raise_for_status()
+    except Exception as e:
+        print(f"⚠️  Could not preload model: {e}")
+
+
+# Searching re-initializes PortAudio, so only do it once per process
+_usb_mic_index = None
+_usb_mic_searched = False
+
+def find_usb_mic():
+    """Find the USB microphone index (or use STORYBOOK_MIC_INDEX if set)"""
+    global _usb_mic_index, _usb_mic_searched
+    
+    if not _usb_mic_searched:
+        if 'STORYBOOK_MIC_INDEX' in os.environ:
+            _usb_mic_index = int(os.environ['STORYBOOK_MIC_INDEX'])
+        else:
+            for i, name in enumerate(sr.Microphone.list_microphone_names()):
+                if 'USB' in name.upper() or 'PNP' in name.upper():
+                    _usb_mic_index = i
+                    print(f"🎤 Found USB microphone: {name}")
+                    break
+        _usb_mic_searched = True
+    
+    return _usb_mic_index
+
+
 class VoiceListener:
     """Voice listener using Google Speech Recognition"""
     
@@ -79,13 +142,7 @@ class VoiceListener:
         print("🎤 Initializing voice listener...")
         
         # Find USB microphone automatically
-        mic_list = sr.Microphone.list_microphone_names()
-        usb_mic_index = None
-        for i, name in enumerate(mic_list):
-            if 'USB' in name.upper() or 'PNP' in name.upper():
-                usb_mic_index = i
-                print(f"🎤 Found USB microphone: {name}")
-                break
+        usb_mic_index = find_usb_mic()
         
         if usb_mic_index is not None:
             self.microphone = sr.Microphone(device_index=usb_mic_index)
@@ -344,8 +401,6 @@ class Storybook:
     
     def generate_story(self, prompt):
         """Generate a story using Ollama"""
-        ollama_url = get_ollama_url()
-        
         full_prompt = (
             f"Tell a short, imaginative story for children about {prompt}. "
             f"Keep it under {MAX_STORY_LENGTH} words. "
@@ -354,8 +409,8 @@ class Storybook:
         )
         
         try:
-            response = requests.post(
-                f"{ollama_url}/api/generate",
+            response = SESSION.post(
+                GENERATE_URL,
                 json={
                     "model": MODEL,
                     "prompt": full_prompt,
@@ -372,7 +427,7 @@ class Storybook:
             )
             
             response.raise_for_status()
-            return response.json()['response'].strip()
+            return orjson.loads(response.content)['response'].strip()
             
         except Exception as e:
             print(f"❌ Story generation error: {e}")
@@ -615,6 +670,9 @@ def main():
     signal.signal(signal.SIGINT, cleanup_handler)
     signal.signal(signal.SIGTERM, cleanup_handler)
     
+    # Load the model in the background while the UI and microphone start up
+    threading.Thread(target=warm_model, daemon=True).start()
+    
     book = Storybook()
     try:
         book.run()